@@ -35,9 +35,10 @@ mf.kernel()
 #
 dm1 = mf.make_rdm1()
 
+# Charge and spin do not change the basis or the integrals: no need to rebuild
+# the molecule
 mol.charge = 0
 mol.spin = 6
-mol.build(False,False)
 
 mf = scf.RHF(mol)
 mf.chkfile = 'cr_atom.chk'
@@ -52,9 +53,10 @@ mf.kernel(dm0=dm1)
 #
 # Use the converged small-basis ROHF to produce initial guess for large basis
 #
-mol.basis = 'aug-cc-pvdz'
-mol.build(False, False)
-mf = scf.RHF(mol)
+mol_large = mol.copy()
+mol_large.basis = 'aug-cc-pvdz'
+mol_large.build(False, False)
+mf = scf.RHF(mol_large)
 mf.level_shift = .2
 mf.irrep_nelec = {'Ag': (6,3), 'B1g': (1,0), 'B2g': (1,0), 'B3g': (1,0)}
 # init guess can be read from chkfile
@@ -69,7 +71,7 @@ mf.kernel(dm)
 # SOSCF solver often provides reliable results that reserve the spherical
 # symmetry.
 #
-mf1 = scf.RHF(mol).newton()
+mf1 = scf.RHF(mol_large).newton()
 dm = mf1.from_chk('cr_atom.chk')
 mf1.kernel(dm)
 
@@ -77,17 +79,12 @@ mf1.kernel(dm)
 #
 # UHF is another way to produce initial guess
 #
-charge = 0
-spin = 6
-mol.basis = 'aug-cc-pvdz'
-mol.build(False,False)
-
-mf = scf.UHF(mol)
+mf = scf.UHF(mol_large)
 mf.irrep_nelec = {'Ag': (6,3), 'B1g': (1,0), 'B2g': (1,0), 'B3g': (1,0)}
 mf.kernel()
 dm1 = mf.make_rdm1()
 
-mf = scf.ROHF(mol)
+mf = scf.ROHF(mol_large)
 mf.irrep_nelec = {'Ag': (6,3), 'B1g': (1,0), 'B2g': (1,0), 'B3g': (1,0)}
 mf.kernel(dm1)
 
@@ -111,7 +108,6 @@ mo, mo_occ = mf.mo_coeff, mf.mo_occ
 
 mol.charge = 0
 mol.spin = 6
-mol.build(False,False)
 
 mf = scf.RHF(mol).x2c().newton()
 mo_occ[9:15] = 1
@@ -58,7 +58,7 @@ class PhysERI(td.PhysERI):
         return super(PhysERI, self).tdhf_diag(pairs=((i, i) for i in range(len(self.model.kpts))))
 
     def __calc_block__(self, item, k):
-        if k in self.__full_eri_k__:
+        if self.kconserv[k[:3]] == k[3]:
             return super(PhysERI, self).__calc_block__(item, k)
         else:
             raise RuntimeError("The block k = {:d} + {:d} - {:d} - {:d} does not conserve momentum".format(*k))
@@ -104,7 +104,7 @@ class PhysERI4(PhysERI):
     ]
 
     def __calc_block__(self, item, k):
-        if k in self.__full_eri_k__:
+        if self.kconserv[k[:3]] == k[3]:
             return td.PhysERI4.__calc_block__.im_func(self, item, k)
         else:
             raise RuntimeError("The block k = {:d} + {:d} - {:d} - {:d} does not conserve momentum".format(*k))
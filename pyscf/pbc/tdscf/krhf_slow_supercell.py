@@ -18,15 +18,17 @@ procedure. Several variants of TDHF are available:
    an arbitrary number of k-points and employs k-point conservation (diagonalizes matrix blocks separately).
 """
 
-from pyscf.tdscf.common_slow import TDERIMatrixBlocks, PeriodicMFMixin
+from pyscf.tdscf.common_slow import TDERIMatrixBlocks, PeriodicMFMixin, mknj2i
 from pyscf.tdscf import rhf_slow
 
-from pyscf.pbc.lib.kpts_helper import loop_kkk
+from pyscf.pbc.lib.kpts_helper import loop_kkk, gamma_point
+from pyscf.pbc import df
+from pyscf import lib
 from pyscf.lib import logger
 
 import numpy
-import scipy
 from itertools import product
+from multiprocessing.pool import ThreadPool
 
 
 # Convention for these modules:
@@ -38,23 +40,92 @@ from itertools import product
 
 class PhysERI(PeriodicMFMixin, TDERIMatrixBlocks):
 
-    def __init__(self, model, frozen=None):
+    def __init__(self, model, frozen=None, dtype=None):
         """
         The TDHF ERI implementation performing a full transformation of integrals to Bloch functions. No symmetries are
-        employed in this class.
+        employed in this class. For Gaussian density fitting (GDF) only 3-index integrals are transformed and stored:
+        4-index blocks are contracted from them on demand.
 
         Args:
             model (KRHF): the base model;
             frozen (int, Iterable): the number of frozen valence orbitals or the list of frozen orbitals for all
             k-points or multiple lists of frozen orbitals for each k-point;
+            dtype (numpy.dtype): if specified, the precision to store ERI in (for example, `numpy.complex64` or
+            `numpy.float32` halve the memory footprint at the cost of accuracy; whether ERI are real or complex is
+            determined by the model; the eigenvalue problem is still solved in double precision);
         """
         TDERIMatrixBlocks.__init__(self)
         PeriodicMFMixin.__init__(self, model, frozen=frozen)
-        # Phys representation
-        self.__full_eri_k__ = {}
-        for k in loop_kkk(len(model.kpts)):
-            k = k + (self.kconserv[k],)
-            self.__full_eri_k__[k] = self.ao2mo_k(tuple(self.mo_coeff[j] for j in k), k)
+        self.__init_blocks__(dtype=dtype)
+        mo_coeff = self.mo_coeff
+        if isinstance(model.with_df, df.GDF) and not isinstance(model.with_df, df.MDF):
+            # 3-index representation for each pair of k-points
+            self.__full_eri_k__ = None
+            self.__cderi_k__ = {}
+            tasks = self._default_pairs
+
+            def calc(k):
+                return self.cderi_k(tuple(mo_coeff[j] for j in k), k)
+
+        else:
+            # Phys representation: the fourth k-point is fixed by momentum conservation
+            self.__full_eri_k__ = numpy.empty((self.nk,) * 3, dtype=object)
+            tasks = tuple(k + (self.kconserv[k],) for k in loop_kkk(self.nk))
+
+            def calc(k):
+                return self.ao2mo_k(tuple(mo_coeff[j] for j in k), k)
+
+        # The first transformation runs with all OpenMP threads: it also initializes DF integrals if needed
+        results = [calc(tasks[0])]
+        # The rest are independent: they are distributed over a pool of single-threaded workers
+        if len(tasks) > 1:
+            nthreads = lib.num_threads()
+            with lib.with_omp_threads(1):
+                pool = ThreadPool(min(nthreads, len(tasks) - 1))
+                try:
+                    results.extend(pool.map(calc, tasks[1:]))
+                finally:
+                    pool.close()
+                    pool.join()
+
+        for k, r in zip(tasks, results):
+            if self.__full_eri_k__ is None:
+                self.__cderi_k__[k] = r
+            else:
+                self.__full_eri_k__[k[:3]] = r
+
+    def __init_blocks__(self, dtype=None):
+        """
+        Pre-computes k-points, k-point pairs, slices and coefficients of occupied ('o') and virtual ('v') orbitals for
+        each k-point.
+        Args:
+            dtype (numpy.dtype): the precision to store ERI in or None for the precision of integrals;
+        """
+        self.dtype = dtype
+        self.nk = len(self.model.kpts)
+        self._kpts_list = tuple(self.model.kpts)
+        self._default_pairs = tuple(product(range(self.nk), range(self.nk)))
+        # kconserv[k1, k2, k3] = kconserv_flat[(k1 * nk + k2) * nk + k3]
+        self.kconserv_flat = self.kconserv.reshape(-1)
+        self.__ov_slices__ = tuple(
+            dict(o=slice(0, o), v=slice(o, n))
+            for o, n in zip(self.nocc, self.nmo)
+        )
+        # Occupied and virtual MO coefficients for each k-point
+        self._mo_o = tuple(numpy.asfortranarray(c[:, s["o"]]) for c, s in zip(self.mo_coeff, self.__ov_slices__))
+        self._mo_v = tuple(numpy.asfortranarray(c[:, s["v"]]) for c, s in zip(self.mo_coeff, self.__ov_slices__))
+        # Similarly to ao2mo_7d, ERIs are real at the Gamma point only
+        if gamma_point(self.model.kpts):
+            self.__eri_dtype__ = numpy.result_type(*self.mo_coeff)
+        else:
+            self.__eri_dtype__ = numpy.complex128
+        if dtype is not None:
+            # Only the precision is taken from the argument: real ERIs stay real and complex ERIs stay complex
+            if numpy.issubdtype(self.__eri_dtype__, numpy.complexfloating):
+                self.dtype = numpy.promote_types(numpy.finfo(dtype).dtype, numpy.complex64)
+            else:
+                self.dtype = numpy.finfo(dtype).dtype
+            self.__eri_dtype__ = self.dtype
 
     def ao2mo_k(self, coeff, k):
         """
@@ -68,10 +139,40 @@ class PhysERI(PeriodicMFMixin, TDERIMatrixBlocks):
         """
         coeff = (coeff[0], coeff[2], coeff[1], coeff[3])
         k = (k[0], k[2], k[1], k[3])
-        result = self.model.with_df.ao2mo(coeff, tuple(self.model.kpts[i] for i in k), compact=False)
-        return result.reshape(
+        result = self.model.with_df.ao2mo(coeff, tuple(self._kpts_list[i] for i in k), compact=False)
+        # Contiguous storage makes further slicing of the block cheap
+        result = numpy.ascontiguousarray(result.reshape(
             tuple(i.shape[1] for i in coeff)
-        ).swapaxes(1, 2)
+        ).transpose(0, 2, 1, 3))
+        if self.dtype is not None:
+            result = result.astype(self.dtype, copy=False)
+        return result
+
+    def cderi_k(self, coeff, k):
+        """
+        Density-fitted 3-index integrals in MO basis.
+        Args:
+            coeff (Iterable): a pair of MO orbitals;
+            k (Iterable): the 2 k-points MOs correspond to;
+
+        Returns:
+            3-index integrals in MO basis and signs of auxiliary functions in the ERI decomposition.
+        """
+        kpts = numpy.array(tuple(self._kpts_list[i] for i in k))
+        is_real = gamma_point(kpts) and not any(numpy.iscomplexobj(i) for i in coeff)
+        nao = coeff[0].shape[0]
+        result = []
+        sign = []
+        for LpqR, LpqI, s in self.model.with_df.sr_loop(kpts, compact=False):
+            Lpq = LpqR if is_real else LpqR + LpqI * 1j
+            Lpq = Lpq.reshape(-1, nao, nao)
+            result.append(lib.einsum("Pab,ai,bj->Pij", Lpq, coeff[0].conj(), coeff[1]))
+            sign.append(numpy.full(len(Lpq), s))
+        result = numpy.concatenate(result)
+        if self.dtype is not None:
+            result = result.astype(self.dtype, copy=False)
+        # Signs are stored in the precision of integrals: integer signs would promote blocks to double precision
+        return result, numpy.concatenate(sign).astype(result.real.dtype)
 
     def __get_mo_energies__(self, k1, k2):
         """This routine collects occupied and virtual MO energies."""
@@ -90,6 +191,20 @@ class PhysERI(PeriodicMFMixin, TDERIMatrixBlocks):
         # Everything is already implemented in molecular code
         return super(PhysERI, self).tdhf_diag(k1, k2)
 
+    def tdhf_diag_k_size(self, k1, k2):
+        """
+        The size of the diagonal block (without computing it).
+        Args:
+            k1 (int): first k-index (row);
+            k2 (int): second k-index (column);
+
+        Returns:
+            The number of rows in the diagonal block.
+        """
+        o = self.__ov_slices__[k1]["o"]
+        v = self.__ov_slices__[k2]["v"]
+        return (o.stop - o.start) * (v.stop - v.start)
+
     def tdhf_diag(self, pairs=None):
         """
         Retrieves the merged diagonal block with specified or all possible k-index pairs.
@@ -100,21 +215,51 @@ class PhysERI(PeriodicMFMixin, TDERIMatrixBlocks):
             The diagonal block.
         """
         if pairs is None:
-            pairs = product(range(len(self.model.kpts)), range(len(self.model.kpts)))
-        result = []
+            pairs = self._default_pairs
+        pairs = tuple(pairs)
+        # Blocks are diagonal: their diagonals are computed from MO energies and written one by one into the merged
+        # diagonal. Real-valued, in the same precision as ERI
+        result = numpy.empty(
+            sum(self.tdhf_diag_k_size(k1, k2) for k1, k2 in pairs),
+            dtype=numpy.finfo(self.__eri_dtype__).dtype,
+        )
+        offset = 0
         for k1, k2 in pairs:
-            result.append(self.tdhf_diag_k(k1, k2))
-        return scipy.linalg.block_diag(*result)
+            n = self.tdhf_diag_k_size(k1, k2)
+            e_occ, e_virt = self.__get_mo_energies__(k1, k2)
+            result[offset:offset + n] = (- e_occ[:, numpy.newaxis] + e_virt[numpy.newaxis, :]).reshape(-1)
+            offset += n
+        return numpy.diag(result)
+
+    def __zero_block__(self, item, k):
+        """
+        A zero block of ERI for k-points that do not conserve momentum.
+        Args:
+            item (str): a 4-character string of 'o' and 'v' letters;
+            k (Iterable): k indexes;
+
+        Returns:
+            A zero block of the corresponding shape.
+        """
+        return numpy.zeros(tuple(
+            self.__ov_slices__[_k][i].stop - self.__ov_slices__[_k][i].start
+            for i, _k in zip(item, k)
+        ), dtype=self.__eri_dtype__)
 
     def __calc_block__(self, item, k):
-        if k in self.__full_eri_k__:
-            slc = tuple(slice(self.nocc[_k]) if i == 'o' else slice(self.nocc[_k], None) for i, _k in zip(item, k))
-            return self.__full_eri_k__[k][slc]
+        # Only momentum-conserving blocks are stored: others are zero and are not looked up
+        if self.kconserv_flat[(k[0] * self.nk + k[1]) * self.nk + k[2]] == k[3]:
+            slc = tuple(self.__ov_slices__[_k][i] for i, _k in zip(item, k))
+            if self.__full_eri_k__ is None:
+                # Phys (k1 k2|k3 k4) is chemist's (k1 k3|k2 k4)
+                l13, sign = self.__cderi_k__[k[0], k[2]]
+                l24, _ = self.__cderi_k__[k[1], k[3]]
+                l13 = l13[:, slc[0], slc[2]] * sign[:, numpy.newaxis, numpy.newaxis]
+                l24 = l24[:, slc[1], slc[3]]
+                return numpy.ascontiguousarray(numpy.tensordot(l13, l24, axes=(0, 0)).transpose(0, 2, 1, 3))
+            return self.__full_eri_k__[k[:3]][slc]
         else:
-            return numpy.zeros(tuple(
-                self.nocc[_k] if i == 'o' else self.nmo[_k] - self.nocc[_k]
-                for i, _k in zip(item, k)
-            ))
+            return self.__zero_block__(item, k)
 
     def eri_mknj_k(self, item, k):
         """
@@ -141,22 +286,33 @@ class PhysERI(PeriodicMFMixin, TDERIMatrixBlocks):
             The corresponding block of ERI (phys notation).
         """
         if pairs_row is None:
-            pairs_row = product(range(len(self.model.kpts)), range(len(self.model.kpts)))
+            pairs_row = self._default_pairs
         if pairs_column is None:
-            pairs_column = product(range(len(self.model.kpts)), range(len(self.model.kpts)))
-        # Second index has to support re-iterations
+            pairs_column = self._default_pairs
+        pairs_row = tuple(pairs_row)
         pairs_column = tuple(pairs_column)
-        result = []
-        for k1, k2 in pairs_row:
-            result.append([])
-            for k3, k4 in pairs_column:
-                result[-1].append(self.eri_mknj_k(item, (k1, k2, k3, k4)))
-
-        r = numpy.block(result)
-        return r / len(self.model.kpts)
+        ix = mknj2i(item)
+        nk = self.nk
+        # Row and column offsets of blocks: blocks are always ordered as 'mk,nj' = 'ov,ov'
+        nocc = self.nocc
+        nvir = tuple(i - j for i, j in zip(self.nmo, nocc))
+        rows = numpy.cumsum((0,) + tuple(nocc[k1] * nvir[k2] for k1, k2 in pairs_row))
+        columns = numpy.cumsum((0,) + tuple(nocc[k3] * nvir[k4] for k3, k4 in pairs_column))
+
+        r = numpy.zeros((rows[-1], columns[-1]), dtype=self.__eri_dtype__)
+        # Blocks are scaled as they are placed, instead of scaling the whole matrix afterwards
+        scale = 1. / nk
+        for (k1, k2), r0, r1 in zip(pairs_row, rows[:-1], rows[1:]):
+            for (k3, k4), c0, c1 in zip(pairs_column, columns[:-1], columns[1:]):
+                k = (k1, k2, k3, k4)
+                # Blocks which do not conserve momentum are zero
+                if self.kconserv_flat[(k[ix[0]] * nk + k[ix[1]]) * nk + k[ix[2]]] == k[ix[3]]:
+                    numpy.multiply(self.eri_mknj_k(item, k), scale, out=r[r0:r1, c0:c1])
+        return r
 
 
 class PhysERI4(PhysERI):
+    # Blocks are transformed on demand: `eri_ov` caches every symmetry-equivalent permutation of a computed block
     symmetries = [
         ((0, 1, 2, 3), False),
         ((1, 0, 3, 2), False),
@@ -164,7 +320,7 @@ class PhysERI4(PhysERI):
         ((3, 2, 1, 0), True),
     ]
 
-    def __init__(self, model, frozen=None):
+    def __init__(self, model, frozen=None, dtype=None):
         """
         The TDHF ERI implementation performing a partial transformation of integrals to Bloch functions. A 4-fold
         symmetry of complex-valued wavefunctions is employed in this class.
@@ -173,22 +329,23 @@ class PhysERI4(PhysERI):
             model (KRHF): the base model;
             frozen (int, Iterable): the number of frozen valence orbitals or the list of frozen orbitals for all
             k-points or multiple lists of frozen orbitals for each k-point;
+            dtype (numpy.dtype): if specified, the precision to store ERI in (for example, `numpy.complex64` or
+            `numpy.float32` halve the memory footprint at the cost of accuracy; whether ERI are real or complex is
+            determined by the model; the eigenvalue problem is still solved in double precision);
         """
         TDERIMatrixBlocks.__init__(self)
         PeriodicMFMixin.__init__(self, model, frozen=frozen)
+        self.__init_blocks__(dtype=dtype)
 
     def __calc_block__(self, item, k):
-        if self.kconserv[k[:3]] == k[3]:
+        if self.kconserv_flat[(k[0] * self.nk + k[1]) * self.nk + k[2]] == k[3]:
             logger.info(self.model, "Computing {} {} ...".format(''.join(item), repr(k)))
             return self.ao2mo_k(tuple(
-                self.mo_coeff[_k][:, :self.nocc[_k]] if i == "o" else self.mo_coeff[_k][:, self.nocc[_k]:]
+                self._mo_o[_k] if i == "o" else self._mo_v[_k]
                 for i, _k in zip(item, k)
             ), k)
         else:
-            return numpy.zeros(tuple(
-                self.nocc[_k] if i == 'o' else self.nmo[_k] - self.nocc[_k]
-                for i, _k in zip(item, k)
-            ))
+            return self.__zero_block__(item, k)
 
 
 class PhysERI8(PhysERI4):
@@ -204,7 +361,7 @@ class PhysERI8(PhysERI4):
         ((1, 2, 3, 0), False),
     ]
 
-    def __init__(self, model, frozen=None):
+    def __init__(self, model, frozen=None, dtype=None):
         """
         The TDHF ERI implementation performing a partial transformation of integrals to Bloch functions. An 8-fold
         symmetry of real-valued wavefunctions is employed in this class.
@@ -213,8 +370,32 @@ class PhysERI8(PhysERI4):
             model (KRHF): the base model;
             frozen (int, Iterable): the number of frozen valence orbitals or the list of frozen orbitals for all
             k-points or multiple lists of frozen orbitals for each k-point;
+            dtype (numpy.dtype): if specified, the precision to store ERI in (for example, `numpy.complex64` or
+            `numpy.float32` halve the memory footprint at the cost of accuracy; whether ERI are real or complex is
+            determined by the model; the eigenvalue problem is still solved in double precision);
+        """
+        super(PhysERI8, self).__init__(model, frozen=frozen, dtype=dtype)
+        self.__eri_dtype__ = numpy.finfo(self.__eri_dtype__).dtype
+
+    def ao2mo_k(self, coeff, k, tolerance=1e-10):
+        """
+        Phys ERI in MO basis (real part only).
+        Args:
+            coeff (Iterable): MO orbitals;
+            k (Iterable): the 4 k-points MOs correspond to;
+            tolerance (float): a tolerance for checking whether integrals are real;
+
+        Returns:
+            ERI in MO basis.
         """
-        super(PhysERI8, self).__init__(model, frozen=frozen)
+        result = super(PhysERI8, self).ao2mo_k(coeff, k)
+        # The 8-fold symmetry holds for real-valued integrals only: drop the complex type
+        if numpy.iscomplexobj(result):
+            if result.size > 0 and abs(result.imag).max() > tolerance:
+                raise ValueError("ERI are complex-valued: the 8-fold symmetry is not available, imaginary part: "
+                                 "{:.3e}".format(abs(result.imag).max()))
+            result = numpy.ascontiguousarray(result.real)
+        return result
 
 
 def vector_to_amplitudes(vectors, nocc, nmo):
@@ -238,7 +419,10 @@ def vector_to_amplitudes(vectors, nocc, nmo):
     nmo = nmo[0]
     vectors = numpy.asanyarray(vectors)
     vectors = vectors.reshape(2, nk, nk, nocc, nmo-nocc, vectors.shape[1])
-    norm = (abs(vectors) ** 2).sum(axis=(1, 2, 3, 4))
+    # Squared moduli are summed without being stored: real and imaginary parts are views of `vectors`
+    norm = numpy.einsum("xklovr,xklovr->xr", vectors.real, vectors.real)
+    if numpy.iscomplexobj(vectors):
+        norm += numpy.einsum("xklovr,xklovr->xr", vectors.imag, vectors.imag)
     norm = 2 * (norm[0] - norm[1])
     vectors /= norm ** .5
     return vectors.transpose(5, 0, 1, 2, 3, 4)
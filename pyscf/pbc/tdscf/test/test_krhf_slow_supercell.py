@@ -256,6 +256,24 @@ class DiamondTestSupercell2(unittest.TestCase):
         # Test real
         testing.assert_allclose(model.e.imag, 0, atol=1e-8)
 
+    def test_dtype(self):
+        """Tests single-precision ERI."""
+        m_ref = ktd.PhysERI4(self.model_krhf).tdhf_full_form()
+        vals_ref, _ = eig(m_ref, nroots=self.td_model_rhf.nroots)
+        for eri in (ktd.PhysERI, ktd.PhysERI4):
+            try:
+                e = eri(self.model_krhf, dtype=numpy.complex64)
+                m = e.tdhf_full_form()
+                testing.assert_equal(m.dtype, numpy.complex64)
+                # Cached blocks are stored in single precision as well
+                for block in e.__eri__.values():
+                    testing.assert_equal(block.dtype, numpy.complex64)
+                vals, _ = eig(m, nroots=self.td_model_rhf.nroots)
+                testing.assert_allclose(vals, vals_ref, atol=1e-5)
+            except Exception:
+                print("When testing {} the following exception occurred:".format(eri))
+                raise
+
 
 class DiamondTestSupercell3(DiamondTestSupercell2):
     """Compare this (supercell_slow) @3kp vs supercell reference (rhf_slow)."""
@@ -264,6 +282,62 @@ class DiamondTestSupercell3(DiamondTestSupercell2):
     test8 = False
 
 
+class FFTDFTest(unittest.TestCase):
+    """Tests ERI implementations with 4-index integrals (FFTDF)."""
+    k = 2
+    k_c = (0, 0, 0)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cell = cell = Cell()
+        # Lift some degeneracies
+        cell.atom = '''
+        C 0.000000000000   0.000000000000   0.000000000000
+        C 1.67   1.68   1.69
+        '''
+        cell.basis = {'C': [[0, (0.8, 1.0)],
+                            [1, (1.0, 1.0)]]}
+        cell.pseudo = 'gth-pade'
+        cell.a = '''
+        0.000000000, 3.370137329, 3.370137329
+        3.370137329, 0.000000000, 3.370137329
+        3.370137329, 3.370137329, 0.000000000'''
+        cell.unit = 'B'
+        cell.verbose = 5
+        cell.build()
+
+        k = cell.make_kpts([cls.k, 1, 1], scaled_center=cls.k_c)
+
+        # K-points
+        cls.model_krhf = model_krhf = KRHF(cell, k)
+        model_krhf.conv_tol = 1e-14
+        model_krhf.kernel()
+
+        cls.ref_m = ktd.PhysERI4(model_krhf).tdhf_full_form()
+
+    @classmethod
+    def tearDownClass(cls):
+        # These are here to remove temporary files
+        del cls.model_krhf
+        del cls.cell
+
+    def test_eri(self):
+        """Tests ERI implementations for complex-valued orbitals."""
+        for eri in (ktd.PhysERI, ktd.PhysERI4):
+            try:
+                e = eri(self.model_krhf)
+                m = e.tdhf_full_form()
+
+                # Test matrix vs ref
+                testing.assert_allclose(m, retrieve_m_hf(e), atol=1e-11)
+
+                # Test matrix vs 4-fold symmetric ERI
+                testing.assert_allclose(self.ref_m, m, atol=1e-11)
+            except Exception:
+                print("When testing {} the following exception occurred:".format(eri))
+                raise
+
+
 class FrozenTest(unittest.TestCase):
     """Tests frozen behavior."""
     k = 2
@@ -14,7 +14,9 @@ from pyscf.lib import logger
 from pyscf.pbc.tools import get_kconserv
 
 import numpy
-from scipy.linalg import solve
+from scipy.linalg import solve, eigh, cholesky, solve_triangular
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 
 from itertools import count, groupby
 
@@ -510,7 +512,7 @@ class PeriodicMFMixin(object):
         """
         self.model = model
         self.space = format_frozen_k(frozen, len(model.mo_energy[0]), len(model.kpts))
-        self.kconserv = get_kconserv(self.model.cell, self.model.kpts).swapaxes(1, 2)
+        self.kconserv = numpy.ascontiguousarray(get_kconserv(self.model.cell, self.model.kpts).swapaxes(1, 2))
 
     @property
     def mo_coeff(self):
@@ -628,6 +630,35 @@ class VindTracker(object):
             )
 
 
+def eig_blocks(m):
+    """
+    Eigenvalue problem solver for matrices which can be permuted into a block-diagonal form. Blocks are found as
+    groups of indexes not coupled by non-zero matrix elements and diagonalized separately.
+    Args:
+        m (numpy.ndarray): the matrix to diagonalize;
+
+    Returns:
+        Eigenvalues and eigenvectors in the same format as `numpy.linalg.eig`.
+    """
+    # Fully coupled matrices do not need the graph analysis
+    if numpy.count_nonzero(m) == m.size:
+        return numpy.linalg.eig(m)
+    n, labels = connected_components(csr_matrix(m != 0), directed=False)
+    if n == 1:
+        return numpy.linalg.eig(m)
+    result = []
+    for i in range(n):
+        ix = numpy.flatnonzero(labels == i)
+        result.append((ix,) + tuple(numpy.linalg.eig(m[numpy.ix_(ix, ix)])))
+    vals = numpy.concatenate(tuple(i[1] for i in result))
+    vecs = numpy.zeros(m.shape, dtype=numpy.result_type(*tuple(i[2] for i in result)))
+    offset = 0
+    for ix, _, v in result:
+        vecs[ix, offset:offset + len(ix)] = v
+        offset += len(ix)
+    return vals, vecs
+
+
 def eig(m, driver=None, nroots=None, half=True):
     """
     Eigenvalue problem solver.
@@ -642,8 +673,10 @@ def eig(m, driver=None, nroots=None, half=True):
     """
     if driver is None:
         driver = 'eig'
+    # Matrices assembled in single precision are diagonalized in double precision
+    m = numpy.asarray(m, dtype=numpy.promote_types(m.dtype, numpy.float64))
     if driver == 'eig':
-        vals, vecs = numpy.linalg.eig(m)
+        vals, vecs = eig_blocks(m)
         order = numpy.argsort(vals)
         vals, vecs = vals[order], vecs[:, order]
         if half:
@@ -655,12 +688,46 @@ def eig(m, driver=None, nroots=None, half=True):
     return vals, vecs
 
 
+def eig_mk_sym(mk, k, nroots=None):
+    """
+    Eigenvalue problem solver for the MK form of the TD problem. With the Cholesky factorization `K = L L^T` the
+    problem is transformed into the symmetric `L^T M L` form which is diagonalized with `scipy.linalg.eigh`: only the
+    lowest `nroots` roots are computed.
+    Args:
+        mk (numpy.ndarray): TD MK-matrix;
+        k (numpy.ndarray): TD K-matrix (has to be positive-definite);
+        nroots (int): the number of roots to calculate;
+
+    Returns:
+        Eigenvalues and eigenvectors of the MK matrix in the same format as `eig`.
+    """
+    # Matrices assembled in single precision are diagonalized in double precision
+    mk = numpy.asarray(mk, dtype=numpy.promote_types(mk.dtype, numpy.float64))
+    k = numpy.asarray(k, dtype=numpy.promote_types(k.dtype, numpy.float64))
+    # Raises LinAlgError if K is not positive-definite
+    l = cholesky(k, lower=True)
+    # L^T M L = L^T (MK) L^-T
+    m = solve_triangular(l, l.T.dot(mk).T, lower=True).T
+    if nroots is None:
+        vals, vecs = eigh(m)
+    else:
+        subset = (0, min(nroots, len(m)) - 1)
+        try:
+            vals, vecs = eigh(m, subset_by_index=subset)
+        except TypeError:
+            # scipy < 1.5
+            vals, vecs = eigh(m, eigvals=subset)
+    # x = L^-T y
+    return vals, solve_triangular(l, vecs, trans='T', lower=True)
+
+
 def kernel(eri, driver=None, fast=True, nroots=None, **kwargs):
     """
     Calculates eigenstates and eigenvalues of the TDHF problem.
     Args:
         eri (TDDFTMatrixBlocks): ERI;
-        driver (str): one of the eigenvalue problem drivers;
+        driver (str): one of the eigenvalue problem drivers ('eigh' solves the symmetric form of the MK problem and
+        requires `fast`);
         fast (bool): whether to run diagonalization on smaller matrixes;
         nroots (int): the number of roots to calculate;
         **kwargs: arguments to `eri.tdhf_matrix`;
@@ -679,7 +746,10 @@ def kernel(eri, driver=None, fast=True, nroots=None, **kwargs):
             'x'.join(map(str, tdhf_mk.shape)),
             "'{}'".format(driver) if driver is not None else "a default method",
         ))
-        vals, vecs_x = eig(tdhf_mk, driver=driver, nroots=nroots, half=False)
+        if driver == 'eigh':
+            vals, vecs_x = eig_mk_sym(tdhf_mk, tdhf_k, nroots=nroots)
+        else:
+            vals, vecs_x = eig(tdhf_mk, driver=driver, nroots=nroots, half=False)
 
         vals = vals ** .5
         vecs_y = (1. / vals)[numpy.newaxis, :] * tdhf_k.dot(vecs_x)
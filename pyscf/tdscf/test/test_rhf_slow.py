@@ -2,7 +2,7 @@ from pyscf.gto import Mole
 from pyscf.scf import RHF
 from pyscf.tdscf import TDHF
 from pyscf.tdscf.rhf_slow import PhysERI, PhysERI4, PhysERI8, TDRHF
-from pyscf.tdscf.common_slow import eig, full2ab, ab2full, full2mkk, mkk2full, ab2mkk, mkk2ab
+from pyscf.tdscf.common_slow import eig, eig_blocks, full2ab, ab2full, full2mkk, mkk2full, ab2mkk, mkk2ab
 
 import numpy
 from numpy import testing
@@ -116,6 +116,12 @@ class H20Test(unittest.TestCase):
         assert_vectors_close(model.xy, self.td_model_rhf.xy, atol=1e-2)
         # Test real-valued
         testing.assert_allclose(model.e.imag, 0, atol=1e-8)
+        # Symmetric form vs fast
+        model.fast = True
+        model.driver = 'eigh'
+        model.kernel()
+        testing.assert_allclose(model.e, e)
+        assert_vectors_close(model.xy, xy)
 
     def test_class_frozen(self):
         """Tests container behavior."""
@@ -138,3 +144,28 @@ class H20Test(unittest.TestCase):
         vals = eri.ao2mo((self.model_rhf.mo_coeff,) * 4)
         for i, c in eri.symmetries:
             testing.assert_allclose(vals, vals.transpose(*i), atol=1e-14)
+
+
+class EigBlocksTest(unittest.TestCase):
+    """Compare block-wise diagonalization vs reference (numpy)."""
+    def test_eig_blocks(self):
+        """Tests a permuted block-diagonal matrix."""
+        numpy.random.seed(0)
+        m = numpy.zeros((10, 10))
+        for i, j in ((0, 3), (3, 4), (4, 10)):
+            m[i:j, i:j] = numpy.random.rand(j - i, j - i)
+        p = numpy.random.permutation(len(m))
+        m = m[numpy.ix_(p, p)]
+
+        vals, vecs = eig_blocks(m)
+        vals_ref, vecs_ref = numpy.linalg.eig(m)
+        order, order_ref = numpy.argsort(vals), numpy.argsort(vals_ref)
+        testing.assert_allclose(vals[order], vals_ref[order_ref], atol=1e-12)
+        assert_vectors_close(vecs[:, order].T, vecs_ref[:, order_ref].T, atol=1e-12)
+
+        # Fully coupled
+        m = numpy.random.rand(10, 10)
+        vals, vecs = eig_blocks(m)
+        vals_ref, vecs_ref = numpy.linalg.eig(m)
+        testing.assert_allclose(vals, vals_ref)
+        testing.assert_allclose(vecs, vecs_ref)